@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+comun.py
+Código de ide.py y proyectos.py que no depende de Qt (y se puede probar sin él).
+"""
+
+import os
+import shutil
+import tempfile
+
+# ---------------------------
+# Ejecución (Run)
+# ---------------------------
+# Script del intérprete precalentado para Run: recibe por stdin la ruta de la
+# pestaña, el tamaño en bytes y el código del editor, y lo ejecuta como
+# "python <ruta>" sin pasar por un temporal. Como runpy, el código corre en un
+# módulo __main__ propio registrado en sys.modules, para que pickle,
+# multiprocessing o get_type_hints encuentren sus clases por nombre
+RUN_WORKER_SCRIPT = (
+    "import linecache, os, sys, traceback, types\n"
+    "path = sys.stdin.buffer.readline().decode('utf-8').rstrip('\\n')\n"
+    "size = int(sys.stdin.buffer.readline())\n"
+    "src = sys.stdin.buffer.read(size).decode('utf-8')\n"
+    "sys.argv = [path]\n"
+    "sys.path[0] = os.path.dirname(path)\n"
+    "linecache.cache[path] = (len(src), None, src.splitlines(True), path)\n"
+    "mod = types.ModuleType('__main__')\n"
+    "mod.__file__ = path\n"
+    "mod.__builtins__ = __builtins__\n"
+    "sys.modules['__main__'] = mod\n"
+    "try:\n"
+    "    code = compile(src, path, 'exec')\n"
+    "    exec(code, mod.__dict__)\n"
+    "except SystemExit:\n"
+    "    raise\n"
+    "except BaseException as e:\n"
+    "    traceback.print_exception(type(e), e, e.__traceback__.tb_next)\n"
+    "    sys.exit(1)\n"
+)
+
+# ---------------------------
+# Escritura atómica
+# ---------------------------
+# umask del proceso, para dar a los archivos nuevos los permisos que tendrían
+# con open(); os.umask solo se puede leer cambiándolo, así que se restaura
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def write_text_file(path, text, sync=False):
+    """Escribe en un temporal junto al destino y lo renombra encima, así nunca
+    queda un archivo a medio escribir. Si la ruta es un enlace simbólico se
+    reemplaza el archivo al que apunta, no el enlace. Con sync=True además
+    fuerza el volcado a disco (fsync) antes del renombrado."""
+    target = os.path.realpath(path)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        # mkstemp crea el temporal con permisos 0600
+        if os.path.exists(target):
+            shutil.copymode(target, tmp)
+        else:
+            os.chmod(tmp, 0o666 & ~_UMASK)
+        os.replace(tmp, target)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
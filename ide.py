@@ -19,21 +19,37 @@ Características integradas:
 
 import sys
 import os
+import codecs
+import copy
 import json
-import tempfile
+import marshal
 import shutil
+from functools import lru_cache
 
-from PySide6.QtCore import QDir, QRegularExpression, Qt, QProcess, QRect, QSize, QPoint
-from PySide6.QtGui import QAction, QColor, QFont, QSyntaxHighlighter, QTextCharFormat, QTextCursor, QPainter
+try:
+    import orjson  # opcional: parser JSON en C, bastante más rápido que json
+except ImportError:
+    orjson = None
+
+from PySide6.QtCore import (
+    QDir, QEvent, QObject, QRegularExpression, Qt, QProcess, QProcessEnvironment, QRect, QSize,
+    QPoint, QPointF, QTimer, QRunnable, QThreadPool, QStandardPaths, Signal
+)
+from PySide6.QtGui import (
+    QAction, QColor, QFont, QTextCharFormat, QTextCursor, QTextLayout, QPainter,
+    QStaticText, QTransform
+)
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QHBoxLayout,
     QTreeView, QFileSystemModel, QTabWidget,
-    QPlainTextEdit, QStatusBar, QFileDialog, QMenuBar,
+    QPlainTextEdit, QTextEdit, QStatusBar, QFileDialog, QMenuBar,
     QDockWidget, QInputDialog, QMessageBox,
     QDialog, QVBoxLayout, QLabel, QPushButton, QHBoxLayout as QHLayout,
     QListWidget, QMenu
 )
 
+from comun import RUN_WORKER_SCRIPT, write_text_file
+
 # ---------------------------
 # Paths de configuración
 # ---------------------------
@@ -41,16 +57,91 @@ BASE_DIR = os.path.dirname(__file__)
 KW_PATH = os.path.join(BASE_DIR, "palabras_reservadas.json")
 THEME_PATH = os.path.join(BASE_DIR, "temas.json")
 STATE_PATH = os.path.join(BASE_DIR, "estado.json")
+# Archivos a partir de este tamaño se leen en segundo plano
+ASYNC_LOAD_THRESHOLD = 1024 * 1024
+# Código a partir de este tamaño se compila en un proceso aparte al depurar
+ASYNC_COMPILE_THRESHOLD = 256 * 1024
+# Líneas máximas que conserva el panel Output
+OUTPUT_MAX_BLOCKS = 10000
+
+# Script del proceso hijo de depuración: lee el código por stdin y, si hay
+# SyntaxError, imprime {"lineno": ..., "msg": ...} en JSON
+CHECK_SYNTAX_SCRIPT = (
+    "import json, sys\n"
+    "src = sys.stdin.buffer.read().decode('utf-8')\n"
+    "try:\n"
+    "    compile(src, '<string>', 'exec')\n"
+    "except SyntaxError as e:\n"
+    "    print(json.dumps({'lineno': e.lineno, 'msg': e.msg}))\n"
+)
 
 # ---------------------------
-# Carga de keywords (si existe)
+# Carga de JSON con caché (marshal)
 # ---------------------------
-if os.path.exists(KW_PATH):
+def load_cached_json(path, default):
+    """Carga un JSON reutilizando una copia marshal (path + ".cache") si el
+    archivo no ha cambiado (mismo mtime y tamaño). Devuelve default si falla."""
+    cache_path = path + ".cache"
+    try:
+        st = os.stat(path)
+    except OSError:
+        return default
+    key = (st.st_mtime_ns, st.st_size)
     try:
-        with open(KW_PATH, "r", encoding="utf-8") as f:
-            KEYWORDS = json.load(f)
+        with open(cache_path, "rb") as f:
+            cached_key, data = marshal.load(f)
+        if tuple(cached_key) == key:
+            return data
     except Exception:
-        KEYWORDS = []
+        pass
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw.decode("utf-8"))
+    except Exception:
+        return default
+    try:
+        with open(cache_path, "wb") as f:
+            marshal.dump((key, data), f)
+    except Exception:
+        pass
+    return data
+
+def read_text_file(path):
+    """Lee un archivo UTF-8 de una vez en binario y lo decodifica, con los
+    saltos de línea normalizados a "\n" como en modo texto."""
+    with open(path, "rb") as f:
+        data = f.read()
+    text = data.decode("utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+def write_json_atomic(path, data):
+    """Escribe el JSON de forma atómica (ver comun.write_text_file)."""
+    write_text_file(path, json.dumps(data, indent=2))
+
+# .pyc de los scripts ejecutados con Run: fuera del proyecto, pero persistentes
+# entre ejecuciones para que los módulos importados no se recompilen cada vez
+@lru_cache(maxsize=1)
+def pycache_dir():
+    """Subcarpeta pycache de la caché de la aplicación según la plataforma
+    (QStandardPaths), creada la primera vez que se pide. None si no hay dónde."""
+    base = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+    if not base:
+        return None
+    path = os.path.join(base, "pycache")
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+    return path
+
+# ---------------------------
+# Carga de keywords (si existe)
+# ---------------------------
+if os.path.exists(KW_PATH):
+    KEYWORDS = load_cached_json(KW_PATH, [])
 else:
     KEYWORDS = [
         "import", "from", "class", "def", "if", "elif", "else",
@@ -59,6 +150,44 @@ else:
         "break", "continue", "yield", "assert", "async", "await",
         "global", "nonlocal", "del", "raise", "is", "lambda"
     ]
+KEYWORDS = frozenset(w for w in KEYWORDS if isinstance(w, str) and w)
+
+# Una sola alternancia \b(?:kw1|kw2|...)\b para todas las palabras reservadas.
+# Las más largas primero para que ningún prefijo tape a otra palabra.
+_KW_ALT = "|".join(sorted(map(QRegularExpression.escape, KEYWORDS), key=lambda w: (-len(w), w)))
+KEYWORD_REGEX = r"\b(?:" + _KW_ALT + r")\b" if KEYWORDS else r"(?!)"
+# Strings: primero las triples (si no cierran en la línea se colorean hasta el
+# final), luego las simples con escapes \' \" \\. Cuantificadores posesivos
+# (*+) para que PCRE2 no retroceda nunca en líneas largas.
+STRING_REGEX = (
+    r"'''(?:[^'\\]|\\.|'(?!''))*+(?:'''|$)"
+    r'|"""(?:[^"\\]|\\.|"(?!""))*+(?:"""|$)'
+    r"|'(?:[^'\\]|\\.)*+'"
+    r'|"(?:[^"\\]|\\.)*+"'
+)
+COMMENT_REGEX = r"#.*"
+
+# Tokenizador de una sola pasada, compilado una vez: cada coincidencia es un
+# comentario (grupo 1), un string (grupo 2) o una palabra reservada (grupo 3).
+# Al recorrer la línea de izquierda a derecha, un '#' dentro de un string
+# forma parte del string y una keyword dentro de un comentario no se marca.
+TOKEN_COMMENT, TOKEN_STRING, TOKEN_KEYWORD = 1, 2, 3
+TOKEN_PATTERN = QRegularExpression(f"({COMMENT_REGEX})|({STRING_REGEX})|({KEYWORD_REGEX})")
+TOKEN_PATTERN.optimize()
+
+@lru_cache(maxsize=4096)
+def tokenize_line(text):
+    """Tokens (inicio, longitud, grupo) de una línea. Se cachea por texto:
+    líneas repetidas o re-tecleadas no vuelven a pasar por el regex."""
+    tokens = []
+    it = TOKEN_PATTERN.globalMatch(text)
+    while it.hasNext():
+        m = it.next()
+        tokens.append((m.capturedStart(), m.capturedLength(), m.lastCapturedIndex()))
+    return tuple(tokens)
+
+# Líneas más largas que esto (p. ej. blobs pegados) se dejan sin resaltar
+MAX_HIGHLIGHT_LINE = 16384
 
 # ---------------------------
 # Utilidades color
@@ -72,6 +201,8 @@ def hex_to_rgb(hex_color: str):
     b = int(h[4:6], 16)
     return r, g, b
 
+# Hay pocos colores distintos (los de los temas): se calcula cada uno una vez
+@lru_cache(maxsize=256)
 def relative_luminance(hex_color: str) -> float:
     r, g, b = [c / 255.0 for c in hex_to_rgb(hex_color)]
     def chan(c):
@@ -89,11 +220,7 @@ def is_light(hex_color: str, threshold: float = 0.6) -> bool:
 # Carga de temas (sin EduDefault) y selección de DEFAULT_THEME
 # ---------------------------
 if os.path.exists(THEME_PATH):
-    try:
-        with open(THEME_PATH, "r", encoding="utf-8") as f:
-            themes_list = json.load(f)
-    except Exception:
-        themes_list = []
+    themes_list = load_cached_json(THEME_PATH, [])
     THEMES = {t["name"]: t for t in themes_list if "name" in t}
     if "Default" in THEMES:
         DEFAULT_THEME = "Default"
@@ -122,15 +249,52 @@ if not THEMES:
     }
     DEFAULT_THEME = "Default"
 
+def editor_stylesheet(theme):
+    # Si el fondo del editor es claro, se fuerza texto oscuro
+    bg = theme.get("background", "#ffffff")
+    fg = theme.get("foreground", "#000000")
+    if is_light(bg):
+        fg = "#111111"
+    return f"background-color: {bg}; color: {fg};"
+
+# Temas claros que deben mostrar texto negro en el árbol
+LIGHT_TREE_THEMES = {"Light", "Solarized Light", "One Light", "Material Light", "Default"}
+
+def tree_stylesheet(theme):
+    # Sidebar / explorer: fondo del tema y texto negro si el tema está en la
+    # lista o el fondo es claro; si no, el foreground del tema
+    sidebar_color = theme.get("sidebar_background", theme.get("background", "#ffffff"))
+    if theme.get("name") in LIGHT_TREE_THEMES or is_light(sidebar_color):
+        tree_text_color = "#000000"
+    else:
+        tree_text_color = theme.get("foreground", "#ffffff")
+    return f"background-color: {sidebar_color}; color: {tree_text_color};"
+
+def output_stylesheet(theme):
+    # Output / terminal: texto oscuro sobre fondo claro y blanco sobre oscuro
+    term_bg = theme.get("terminal_background", theme.get("background", "#ffffff"))
+    term_fg = "#111111" if is_light(term_bg) else "#ffffff"
+    return f"background-color: {term_bg}; color: {term_fg};"
+
+def highlight_colors(theme):
+    # (keyword, comment, string) ya convertidos a QColor
+    return (QColor(theme.get("keyword", "#569CD6")),
+            QColor(theme.get("comment", "#888888")),
+            QColor(theme.get("string", "#008000")))
+
+# Todo lo que se deriva de un tema se calcula una sola vez al cargarlo;
+# cambiar de tema solo asigna valores ya resueltos
+for _theme in THEMES.values():
+    _theme["_stylesheet"] = editor_stylesheet(_theme)
+    _theme["_tree_stylesheet"] = tree_stylesheet(_theme)
+    _theme["_output_stylesheet"] = output_stylesheet(_theme)
+    _theme["_highlight_colors"] = highlight_colors(_theme)
+
 # ---------------------------
 # Carga de estado previo
 # ---------------------------
 if os.path.exists(STATE_PATH):
-    try:
-        with open(STATE_PATH, "r", encoding="utf-8") as f:
-            STATE = json.load(f)
-    except Exception:
-        STATE = {"open_files": [], "current_theme": DEFAULT_THEME, "last_dir": ""}
+    STATE = load_cached_json(STATE_PATH, {"open_files": [], "current_theme": DEFAULT_THEME, "last_dir": ""})
 else:
     STATE = {"open_files": [], "current_theme": DEFAULT_THEME, "last_dir": ""}
 
@@ -138,47 +302,179 @@ else:
 # XOR Cipher
 # ---------------------------
 ENCRYPTION_KEY = 67
+
+@lru_cache(maxsize=8)
+def _xor_table(key):
+    # Tabla de traducción byte -> byte ^ clave (XOR es involutivo: sirve para cifrar y descifrar)
+    return bytes(i ^ key for i in range(256))
+
+# A partir de este tamaño numpy gana incluso a bytes.translate
+NUMPY_XOR_THRESHOLD = 1024 * 1024
+
+@lru_cache(maxsize=1)
+def _numpy():
+    # numpy es opcional y tarda en importarse: solo se carga al cifrar por primera vez
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def xor_cipher_bytes(data, key=ENCRYPTION_KEY):
+    """XOR byte a byte (clave 0-255) sobre datos binarios, sin pasar por str."""
+    np = _numpy() if len(data) >= NUMPY_XOR_THRESHOLD else None
+    if np is not None:
+        return np.bitwise_xor(np.frombuffer(data, dtype=np.uint8), np.uint8(key)).tobytes()
+    # bytes.translate hace todo el bucle en C sin depender de numpy
+    return data.translate(_xor_table(key))
+
 def xor_cipher(text, key=ENCRYPTION_KEY):
-    return ''.join(chr(ord(c) ^ key) for c in text)
+    if text.isascii() and 0 <= key < 128:
+        # Caso común: texto ASCII con clave < 128, el resultado sigue siendo
+        # ASCII y basta con el XOR de bytes
+        return xor_cipher_bytes(text.encode("ascii"), key).decode("ascii")
+    np = _numpy()
+    if np is None:
+        if not 0 <= key < 0x110000:
+            return ''.join(chr(ord(c) ^ key) for c in text)
+        # Sin numpy: el XOR de enteros grandes de CPython recorre la memoria de
+        # palabra en palabra en C, aplicado a todo el texto en UTF-32 de una vez
+        # contra un entero con la clave repetida en cada palabra de 32 bits
+        data = text.encode("utf-32-le", "surrogatepass")
+        mask = int.from_bytes(key.to_bytes(4, "little") * len(text), "little")
+        value = int.from_bytes(data, "little") ^ mask
+        return value.to_bytes(len(data), "little").decode("utf-32-le", "surrogatepass")
+    # XOR por punto de código (igual que chr(ord(c) ^ key)) en una sola
+    # operación vectorizada sobre el texto codificado en UTF-32
+    buf = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    return np.bitwise_xor(buf, np.uint32(key)).tobytes().decode("utf-32-le", "surrogatepass")
+
+# ---------------------------
+# Comprobación de sintaxis
+# ---------------------------
+def check_syntax(code):
+    """(línea, mensaje) del primer SyntaxError, o (None, None) si compila."""
+    try:
+        compile(code, '<string>', 'exec')
+    except SyntaxError as e:
+        return e.lineno or 1, e.msg
+    return None, None
 
 # ---------------------------
 # Line Number Area Widget
 # ---------------------------
 class LineNumberArea(QWidget):
+    BACKGROUND = QColor("#f0f0f0")
+    FOREGROUND = QColor("#888888")
+
+    # Máximo de números de línea pre-maquetados que se guardan
+    STATIC_TEXT_CACHE_SIZE = 4096
+
     def __init__(self, editor):
         super().__init__(editor)
         self.codeEditor = editor
+        self._static_text_cache = {}
 
     def sizeHint(self):
         return QSize(self.codeEditor.lineNumberAreaWidth(), 0)
 
+    def changeEvent(self, e):
+        super().changeEvent(e)
+        if e.type() == QEvent.FontChange:
+            self._static_text_cache.clear()
+
+    def _static_text(self, number):
+        # El texto de cada número se maqueta una sola vez (QStaticText) y se reutiliza
+        st = self._static_text_cache.get(number)
+        if st is None:
+            if len(self._static_text_cache) >= self.STATIC_TEXT_CACHE_SIZE:
+                self._static_text_cache.clear()
+            st = QStaticText(str(number))
+            st.prepare(QTransform(), self.font())
+            self._static_text_cache[number] = st
+        return st
+
     def paintEvent(self, event):
         painter = QPainter(self)
-        painter.fillRect(event.rect(), QColor("#f0f0f0"))
-        block = self.codeEditor.firstVisibleBlock()
+        rect = event.rect()
+        rect_top, rect_bottom = rect.top(), rect.bottom()
+        painter.fillRect(rect, self.BACKGROUND)
+        editor = self.codeEditor
+        block = editor.firstVisibleBlock()
         block_number = block.blockNumber()
-        top = self.codeEditor.blockBoundingGeometry(block).translated(self.codeEditor.contentOffset()).top()
-        bottom = top + self.codeEditor.blockBoundingRect(block).height()
-        line_height = self.codeEditor.fontMetrics().height()
-        painter.setPen(QColor("#888888"))
-        while block.isValid() and top <= event.rect().bottom():
-            if block.isVisible() and bottom >= event.rect().top():
-                number = str(block_number + 1)
-                painter.drawText(0, top, self.width(), line_height, Qt.AlignRight, number)
+        top = editor.blockBoundingGeometry(block).translated(editor.contentOffset()).top()
+        width = self.width()
+        painter.setPen(self.FOREGROUND)
+        # firstVisibleBlock() ya es O(1) en QPlainTextEdit; desde ahí, una sola
+        # consulta de altura por bloque (los bloques con ajuste de línea ocupan
+        # varias líneas) y salida en cuanto se pasa del área expuesta
+        while block.isValid():
+            if top > rect_bottom:
+                break
+            bottom = top + editor.blockBoundingRect(block).height()
+            if bottom >= rect_top and block.isVisible():
+                st = self._static_text(block_number + 1)
+                painter.drawStaticText(QPointF(width - st.size().width(), top), st)
             block = block.next()
             top = bottom
-            bottom = top + (self.codeEditor.blockBoundingRect(block).height() if block.isValid() else line_height)
             block_number += 1
         painter.end()
 
+# ---------------------------
+# Estado por pestaña
+# ---------------------------
+class TabState:
+    """Metadatos de cada pestaña del editor (sin __dict__ por instancia)."""
+    __slots__ = ("file_path", "highlighter", "pending_theme", "loading", "syntax_check")
+
+    def __init__(self, file_path=None, highlighter=None, pending_theme=None):
+        self.file_path = file_path
+        self.highlighter = highlighter
+        self.pending_theme = pending_theme
+        self.loading = False
+        # (revision del documento, línea, mensaje) de la última depuración
+        self.syntax_check = None
+
+# ---------------------------
+# Carga de archivos en segundo plano
+# ---------------------------
+class FileLoaderSignals(QObject):
+    # (editor, ruta, texto o mensaje de error)
+    loaded = Signal(object, str, str)
+    failed = Signal(object, str, str)
+
+class FileLoader(QRunnable):
+    """Lee un archivo en el QThreadPool y emite su texto (o el error) al hilo de la GUI.
+    El editor solo viaja en la señal: el hilo del pool nunca lo toca."""
+    def __init__(self, path, editor):
+        super().__init__()
+        # La vida del objeto la gestiona MainWindow._loaders, no el pool
+        self.setAutoDelete(False)
+        self.path = path
+        self.editor = editor
+        self.signals = FileLoaderSignals()
+
+    def run(self):
+        try:
+            text = read_text_file(self.path)
+        except Exception as ex:
+            self.signals.failed.emit(self.editor, self.path, str(ex))
+            return
+        self.signals.loaded.emit(self.editor, self.path, text)
+
 # ---------------------------
 # Code Editor
 # ---------------------------
 class CodeEditor(QPlainTextEdit):
+    # Cadenas de sangría precalculadas para no reconstruirlas en cada Enter/Tab
+    _INDENTS = tuple(' ' * i for i in range(64))
+
     def __init__(self):
         super().__init__()
+        self.tab_state = TabState()
         space_width = self.fontMetrics().horizontalAdvance(' ')
         self.setTabStopDistance(4 * space_width)
+        self._digit_width = self.fontMetrics().horizontalAdvance('9')
         self.lineNumberArea = LineNumberArea(self)
         self.blockCountChanged.connect(self.updateLineNumberAreaWidth)
         self.updateRequest.connect(self.updateLineNumberArea)
@@ -186,7 +482,14 @@ class CodeEditor(QPlainTextEdit):
 
     def lineNumberAreaWidth(self):
         digits = len(str(max(1, self.blockCount())))
-        return 3 + self.fontMetrics().horizontalAdvance('9') * digits
+        return 3 + self._digit_width * digits
+
+    def changeEvent(self, e):
+        super().changeEvent(e)
+        # El ancho del dígito solo cambia con la fuente
+        if e.type() == QEvent.FontChange:
+            self._digit_width = self.fontMetrics().horizontalAdvance('9')
+            self.updateLineNumberAreaWidth(0)
 
     def updateLineNumberAreaWidth(self, _):
         self.setViewportMargins(self.lineNumberAreaWidth(), 0, 0, 0)
@@ -213,11 +516,13 @@ class CodeEditor(QPlainTextEdit):
             base_indent = len(text) - len(text.lstrip(' '))
             extra = 4 if text.rstrip().endswith(':') else 0
             super().keyPressEvent(event)
-            self.insertPlainText(' ' * (base_indent + extra))
+            n = base_indent + extra
+            if n:
+                self.insertPlainText(self._INDENTS[n] if n < len(self._INDENTS) else ' ' * n)
             return
         # Tab = 4 espacios
         if event.key() == Qt.Key_Tab and not event.modifiers():
-            self.insertPlainText(' ' * 4)
+            self.insertPlainText(self._INDENTS[4])
             return
         # Shift+Tab = des-tabulación
         if event.key() == Qt.Key_Backtab:
@@ -238,42 +543,98 @@ class CodeEditor(QPlainTextEdit):
 # ---------------------------
 # Syntax Highlighter
 # ---------------------------
-class PythonHighlighter(QSyntaxHighlighter):
-    def __init__(self, doc, theme):
-        super().__init__(doc)
-        kw_fmt = QTextCharFormat()
-        kw_fmt.setForeground(QColor(theme.get("keyword", "#569CD6")))
-        kw_fmt.setFontWeight(QFont.Bold)
-        self.keyword_rules = [(QRegularExpression(rf"\b{w}\b"), kw_fmt) for w in KEYWORDS]
+class PythonHighlighter(QObject):
+    """Resaltado solo de los bloques visibles del editor.
+
+    En lugar de QSyntaxHighlighter (que recorre todo el documento al crearse y
+    en cada rehighlight), los formatos se aplican con QTextLayout.setFormats a
+    los bloques que entran en el viewport. Cada bloque resaltado guarda en
+    userState la generación actual; un cambio de texto o de tema lo invalida.
+
+    Se asume (Qt no lo documenta) que QTextDocument crea con userState -1 todo
+    bloque nuevo, sea por dividir uno existente o por insertar texto; por eso
+    en cada cambio basta con invalidar los bloques de sus extremos.
+    """
+    def __init__(self, editor, theme):
+        super().__init__(editor)
+        self.editor = editor
+        self.document = editor.document()
+        self.keyword_format = QTextCharFormat()
+        self.keyword_format.setFontWeight(QFont.Bold)
         self.comment_format = QTextCharFormat()
-        self.comment_format.setForeground(QColor(theme.get("comment", "#888888")))
-        self.comment_pattern = QRegularExpression(r"#.*")
         self.string_format = QTextCharFormat()
-        self.string_format.setForeground(QColor(theme.get("string", "#008000")))
-        self.string_pattern = QRegularExpression(r"(['\"]).*?\1")
+        # Formato por número de grupo del tokenizador
+        self.token_formats = (None, self.comment_format, self.string_format, self.keyword_format)
+        self._set_colors(theme)
+        self._generation = 0
+        self._busy = False
+        editor.updateRequest.connect(self._on_update_request)
+        self.document.contentsChange.connect(self._on_contents_change)
+        self.highlightViewport()
+
+    def _set_colors(self, theme):
+        keyword, comment, string = theme["_highlight_colors"]
+        self.keyword_format.setForeground(keyword)
+        self.comment_format.setForeground(comment)
+        self.string_format.setForeground(string)
+
+    def setTheme(self, theme):
+        # Cambia solo los colores y re-resalta una vez, sin crear otro resaltador
+        self._set_colors(theme)
+        self.rehighlight()
+
+    def rehighlight(self):
+        # Nueva generación: todos los bloques quedan pendientes, solo se rehacen los visibles
+        self._generation += 1
+        self.highlightViewport()
+
+    def _on_update_request(self, rect, dy):
+        self.highlightViewport()
+
+    def _on_contents_change(self, position, removed, added):
+        if self._busy:
+            return
+        first = self.document.findBlock(position)
+        last = self.document.findBlock(position + added)
+        first.setUserState(-1)
+        last.setUserState(-1)
+        self.highlightViewport()
+
+    def highlightViewport(self):
+        if self._busy:
+            return
+        editor = self.editor
+        block = editor.firstVisibleBlock()
+        offset = editor.contentOffset()
+        bottom = editor.viewport().rect().bottom()
+        generation = self._generation
+        self._busy = True
+        try:
+            while block.isValid():
+                if editor.blockBoundingGeometry(block).translated(offset).top() > bottom:
+                    break
+                if block.userState() != generation:
+                    self._format_block(block)
+                    block.setUserState(generation)
+                block = block.next()
+        finally:
+            self._busy = False
+
+    def _format_block(self, block):
+        block.layout().setFormats(self.highlightBlock(block.text()))
+        self.document.markContentsDirty(block.position(), block.length())
 
     def highlightBlock(self, text):
-        string_spans = []
-        it = self.string_pattern.globalMatch(text)
-        while it.hasNext():
-            m = it.next()
-            s, l = m.capturedStart(), m.capturedLength()
-            self.setFormat(s, l, self.string_format)
-            string_spans.append((s, l))
-        comment_spans = []
-        it = self.comment_pattern.globalMatch(text)
-        while it.hasNext():
-            m = it.next()
-            s, l = m.capturedStart(), m.capturedLength()
-            self.setFormat(s, l, self.comment_format)
-            comment_spans.append((s, l))
-        for pat, fmt in self.keyword_rules:
-            it2 = pat.globalMatch(text)
-            while it2.hasNext():
-                m2 = it2.next()
-                s, l = m2.capturedStart(), m2.capturedLength()
-                if not any(start <= s < start + length for start, length in string_spans + comment_spans):
-                    self.setFormat(s, l, fmt)
+        """Devuelve la lista de QTextLayout.FormatRange para una línea."""
+        if not text or len(text) > MAX_HIGHLIGHT_LINE:
+            return []
+        formats = self.token_formats
+        ranges = []
+        for start, length, group in tokenize_line(text):
+            r = QTextLayout.FormatRange()
+            r.start, r.length, r.format = start, length, formats[group]
+            ranges.append(r)
+        return ranges
 
 # ---------------------------
 # Theme Selection Dialog
@@ -288,13 +649,17 @@ class ThemeDialog(QDialog):
         self.list_widget = QListWidget()
         for name in themes:
             self.list_widget.addItem(name)
-        idx = list(themes.keys()).index(current) if current in themes else 0
-        self.list_widget.setCurrentRow(idx)
+        items = self.list_widget.findItems(current, Qt.MatchExactly) if current in themes else []
+        if items:
+            self.list_widget.setCurrentItem(items[0])
+        else:
+            self.list_widget.setCurrentRow(0)
 
         self.preview = QPlainTextEdit()
         self.preview.setReadOnly(True)
         sample = 'def foo():\n    # comentario\n    print("string")\n'
         self.preview.setPlainText(sample)
+        self._highlighter = None
 
         btn_apply = QPushButton("Aplicar")
         btn_cancel = QPushButton("Cancelar")
@@ -315,13 +680,11 @@ class ThemeDialog(QDialog):
 
     def update_preview(self, name):
         theme = self.themes[name]
-        # Determine preview foreground: if background is light, ensure dark text
-        bg = theme.get("background", "#ffffff")
-        fg = theme.get("foreground", "#000000")
-        if is_light(bg):
-            fg = "#111111"
-        self.preview.setStyleSheet(f"background-color: {bg}; color: {fg};")
-        PythonHighlighter(self.preview.document(), theme)
+        self.preview.setStyleSheet(theme["_stylesheet"])
+        if self._highlighter is None:
+            self._highlighter = PythonHighlighter(self.preview, theme)
+        else:
+            self._highlighter.setTheme(theme)
 
     def on_apply(self):
         self.selected = self.list_widget.currentItem().text()
@@ -400,12 +763,20 @@ class MainWindow(QMainWindow):
         self.resize(1024, 768)
 
         self.project_root = project_root or os.getcwd()
+        self._project_abs = os.path.normcase(os.path.abspath(self.project_root))
+        self._project_prefix = os.path.join(self._project_abs, "")
         # File system model limited to project_root
         self.fs_model = QFileSystemModel()
-        self.fs_model.setRootPath(self.project_root)
+        self.fs_model.setReadOnly(True)
+        self.fs_model.setOption(QFileSystemModel.DontUseCustomDirectoryIcons, True)
         self.tree = QTreeView()
+        self.tree.setUniformRowHeights(True)
         self.tree.setModel(self.fs_model)
-        self.tree.setRootIndex(self.fs_model.index(self.project_root))
+        # Solo la columna Name: la vista no pide tamaño, tipo ni fecha de cada entrada
+        for column in (1, 2, 3):
+            self.tree.setColumnHidden(column, True)
+        # La lectura del directorio se difiere hasta que la ventana ya se ha mostrado
+        QTimer.singleShot(0, self._populate_tree)
         self.tree.doubleClicked.connect(self.open_from_tree)
 
         # Context menu setup for tree
@@ -419,6 +790,9 @@ class MainWindow(QMainWindow):
         self.tabs = QTabWidget()
         self.tabs.setTabsClosable(True)
         self.tabs.tabCloseRequested.connect(self.close_tab)
+        self.tabs.currentChanged.connect(self._on_tab_changed)
+        # Lectores en curso por editor (se mantiene la referencia hasta que terminan)
+        self._loaders = {}
 
         # Layout
         container = QWidget()
@@ -434,15 +808,42 @@ class MainWindow(QMainWindow):
         # Output panel
         self.output = QPlainTextEdit()
         self.output.setReadOnly(True)
+        # Solo se guardan las últimas líneas; sin pila de deshacer en la salida
+        self.output.setMaximumBlockCount(OUTPUT_MAX_BLOCKS)
+        self.output.setUndoRedoEnabled(False)
         dock = QDockWidget("Output", self)
         dock.setWidget(self.output)
         self.addDockWidget(Qt.BottomDockWidgetArea, dock)
 
-        # Execution process
-        self.proc = QProcess(self)
-        self.proc.setProcessChannelMode(QProcess.MergedChannels)
-        self.proc.readyReadStandardOutput.connect(self.handle_stdout)
-        self.proc.finished.connect(self.process_finished)
+        # Execution process: se deja un intérprete ya arrancado esperando el
+        # código del script, así Run no paga el arranque de Python
+        self.proc = None
+        self._warm_proc = None
+        # Entorno de ejecución calculado una vez: salida sin búfer para que los
+        # print aparezcan al momento, y los .pyc en pycache_dir() en vez del proyecto
+        self._run_env = QProcessEnvironment.systemEnvironment()
+        self._run_env.insert("PYTHONUNBUFFERED", "1")
+        self._run_env.remove("PYTHONDONTWRITEBYTECODE")
+        cache_dir = pycache_dir()
+        if cache_dir:
+            self._run_env.insert("PYTHONPYCACHEPREFIX", cache_dir)
+        QTimer.singleShot(0, self._prewarm_worker)
+        # Syntax check process (solo para archivos grandes)
+        self.check_proc = QProcess(self)
+        self.check_proc.finished.connect(self._check_finished)
+        self._check_editor = None
+        self._check_revision = None
+        # Selección de la línea con error, creada una vez y reutilizada
+        self._error_selection = QTextEdit.ExtraSelection()
+        self._error_selection.format.setBackground(QColor("#FFCCCC"))
+        # La salida se acumula en bytes y se vuelca como mucho una vez por frame
+        self._out_buf = bytearray()
+        self._out_decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self._out_partial = ""
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(16)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self._flush_output)
 
         # Menus
         menubar = QMenuBar()
@@ -485,6 +886,8 @@ class MainWindow(QMainWindow):
 
         # Themes and state
         self.state = STATE
+        # Copia del estado cargado para no reescribir estado.json si nada cambió
+        self._initial_state = copy.deepcopy(STATE)
         self.themes = THEMES
         # Use saved theme or default determined earlier
         self.current_theme_name = self.state.get("current_theme", DEFAULT_THEME)
@@ -505,13 +908,12 @@ class MainWindow(QMainWindow):
 
         # Reopen previous files only if they belong to this project
         for path in self.state.get("open_files", []):
-            if os.path.isfile(path):
-                try:
-                    common = os.path.commonpath([os.path.abspath(path), os.path.abspath(self.project_root)])
-                except Exception:
-                    common = ""
-                if common == os.path.abspath(self.project_root):
-                    self._load_path(path)
+            if os.path.isfile(path) and self._in_project(path):
+                self._load_path(path)
+
+    def _populate_tree(self):
+        self.fs_model.setRootPath(self.project_root)
+        self.tree.setRootIndex(self.fs_model.index(self.project_root))
 
     def _make_action(self, text, handler, shortcut=None):
         act = QAction(text, self)
@@ -550,7 +952,7 @@ class MainWindow(QMainWindow):
                 can_copy = True
             else:
                 ed = self.tabs.currentWidget()
-                if ed and hasattr(ed, "file_path") and ed.file_path:
+                if ed and ed.tab_state.file_path:
                     can_copy = True
             copy_act.setEnabled(can_copy)
             paste_act.setEnabled(self._clipboard_path is not None)
@@ -587,8 +989,8 @@ class MainWindow(QMainWindow):
             self.status.showMessage(f"Copiado: {self._clipboard_path}", 2000)
             return
         ed = self.tabs.currentWidget()
-        if ed and hasattr(ed, "file_path") and ed.file_path:
-            self._clipboard_path = ed.file_path
+        if ed and ed.tab_state.file_path:
+            self._clipboard_path = ed.tab_state.file_path
             self._clipboard_is_dir = False
             self.status.showMessage(f"Copiado desde pestaña activa: {self._clipboard_path}", 2000)
         else:
@@ -606,8 +1008,7 @@ class MainWindow(QMainWindow):
         try:
             with open(target, 'w', encoding='utf-8') as f:
                 f.write("# Nuevo archivo creado desde el menú contextual\n")
-            # refresh model and open file
-            self.fs_model.refresh()
+            # El árbol se actualiza solo (QFileSystemWatcher); basta con abrir el archivo
             self._load_path(target)
             self.status.showMessage(f"Archivo creado: {target}", 3000)
         except Exception as ex:
@@ -648,7 +1049,6 @@ class MainWindow(QMainWindow):
                         i += 1
                 shutil.copy2(src, dest)
                 self.status.showMessage(f"Archivo pegado en: {dest}", 3000)
-            self.fs_model.refresh()
         except Exception as ex:
             QMessageBox.warning(self, "Error", f"No se pudo pegar: {ex}")
 
@@ -661,7 +1061,6 @@ class MainWindow(QMainWindow):
                 shutil.rmtree(path)
             else:
                 os.remove(path)
-            self.fs_model.refresh()
             self.status.showMessage(f"Eliminado: {path}", 3000)
         except Exception as ex:
             QMessageBox.warning(self, "Error", f"No se pudo eliminar: {ex}")
@@ -678,49 +1077,38 @@ class MainWindow(QMainWindow):
         theme = self.themes.get(theme_name, list(self.themes.values())[0])
         self.current_theme_name = theme_name
 
-        # Sidebar / explorer background
-        sidebar_color = theme.get("sidebar_background", theme.get("background", "#ffffff"))
-
-        # Lista de temas claros que deben mostrar texto negro en el árbol
-        claro_force_black = {"Light", "Solarized Light", "One Light", "Material Light", "Default"}
-
-        # Determinar color de texto del árbol: negro si el tema está en la lista, si no usar foreground del tema
-        if theme_name in claro_force_black:
-            tree_text_color = "#000000"
-        else:
-            tree_text_color = theme.get("foreground", "#ffffff")
-            sb_bg = sidebar_color
-            try:
-                if is_light(sb_bg):
-                    tree_text_color = "#000000"
-            except Exception:
-                pass
-
         # Aplicar estilo al árbol (background + color del texto de los elementos)
-        try:
-            self.tree.setStyleSheet(f"background-color: {sidebar_color}; color: {tree_text_color};")
-        except Exception:
-            pass
+        self.tree.setStyleSheet(theme["_tree_stylesheet"])
+
+        # Editors: se difiere al bucle de eventos para que el diálogo se cierre
+        # y se repinte antes de re-resaltar todas las pestañas
+        QTimer.singleShot(0, lambda: self._restyle_editors(theme))
 
-        # Determine editor foreground: if editor background is light, use dark text
-        editor_bg = theme.get("background", "#ffffff")
-        editor_fg = theme.get("foreground", "#000000")
-        if is_light(editor_bg):
-            editor_fg = "#111111"
+        # Output / terminal background and foreground
+        self.output.setStyleSheet(theme["_output_stylesheet"])
 
-        # Editors
+    def _restyle_editors(self, theme):
+        stylesheet = theme["_stylesheet"]
         for i in range(self.tabs.count()):
             ed = self.tabs.widget(i)
-            ed.setStyleSheet(f"background-color: {editor_bg}; color: {editor_fg};")
-            PythonHighlighter(ed.document(), theme)
+            ed.setStyleSheet(stylesheet)
+            highlighter = ed.tab_state.highlighter
+            if highlighter is None:
+                # Pestaña aún no mostrada: se resaltará con este tema al activarla
+                ed.tab_state.pending_theme = theme
+            else:
+                highlighter.setTheme(theme)
+        self._on_tab_changed(self.tabs.currentIndex())
 
-        # Output / terminal background and foreground
-        term_bg = theme.get("terminal_background", theme.get("background", "#ffffff"))
-        if is_light(term_bg):
-            term_fg = "#111111"
-        else:
-            term_fg = "#ffffff"
-        self.output.setStyleSheet(f"background-color: {term_bg}; color: {term_fg};")
+    def _on_tab_changed(self, index):
+        # Resaltado diferido: el resaltador se crea la primera vez que se muestra la pestaña
+        ed = self.tabs.widget(index)
+        if ed is None:
+            return
+        tab_state = ed.tab_state
+        if tab_state.pending_theme is not None:
+            tab_state.highlighter = PythonHighlighter(ed, tab_state.pending_theme)
+            tab_state.pending_theme = None
 
     # -----------------------
     # Open / Save (limited to project)
@@ -742,49 +1130,95 @@ class MainWindow(QMainWindow):
         if os.path.isfile(path):
             self._load_path(path)
 
+    def _in_project(self, path):
+        # Comparación de prefijo contra la raíz ya normalizada en __init__
+        p = os.path.normcase(os.path.abspath(path))
+        return p == self._project_abs or p.startswith(self._project_prefix)
+
     def _load_path(self, path):
-        try:
-            common = os.path.commonpath([os.path.abspath(path), os.path.abspath(self.project_root)])
-        except Exception:
-            common = ""
-        if common != os.path.abspath(self.project_root):
+        if not self._in_project(path):
             QMessageBox.warning(self, "Fuera del proyecto", "Solo puedes abrir archivos dentro de la carpeta del proyecto.")
             return
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                text = f.read()
+            size = os.path.getsize(path)
+        except OSError as ex:
+            QMessageBox.warning(self, "Error", f"No se pudo abrir el archivo: {ex}")
+            return
+        if size >= ASYNC_LOAD_THRESHOLD:
+            # Archivo grande: la pestaña aparece ya y el texto llega desde el QThreadPool
+            editor = self._add_editor_tab(path, "")
+            editor.setReadOnly(True)
+            editor.tab_state.loading = True
+            loader = FileLoader(path, editor)
+            self._loaders[editor] = loader
+            # Métodos de MainWindow y conexión en cola explícita: los slots
+            # siempre corren en el hilo de la GUI, no en el del pool
+            loader.signals.loaded.connect(self._on_file_loaded, Qt.QueuedConnection)
+            loader.signals.failed.connect(self._on_file_load_failed, Qt.QueuedConnection)
+            QThreadPool.globalInstance().start(loader)
+            self.status.showMessage(f"Cargando: {path}...")
+            return
+        try:
+            text = read_text_file(path)
         except Exception as ex:
             QMessageBox.warning(self, "Error", f"No se pudo abrir el archivo: {ex}")
             return
+        self._add_editor_tab(path, text)
+        self.status.showMessage(f"Abriste: {path}", 3000)
+
+    def _add_editor_tab(self, path, text):
         editor = CodeEditor()
         editor.setPlainText(text)
-        editor.file_path = path
+        editor.tab_state.file_path = path
         editor.document().setModified(False)
 
         # Apply current theme colors to this editor (respecting light/dark fg logic)
         theme = self.themes.get(self.current_theme_name, list(self.themes.values())[0])
-        editor_bg = theme.get("background", "#ffffff")
-        editor_fg = theme.get("foreground", "#000000")
-        if is_light(editor_bg):
-            editor_fg = "#111111"
-        editor.setStyleSheet(f"background-color: {editor_bg}; color: {editor_fg};")
+        editor.setStyleSheet(theme["_stylesheet"])
 
-        PythonHighlighter(editor.document(), theme)
+        editor.tab_state.pending_theme = theme
         title = os.path.basename(path)
         self.tabs.addTab(editor, title)
+        return editor
+
+    def _on_file_loaded(self, editor, path, text):
+        self._loaders.pop(editor, None)
+        if self.tabs.indexOf(editor) == -1:
+            # La pestaña se cerró durante la carga: close_tab dejó el editor vivo para este momento
+            editor.deleteLater()
+            return
+        editor.setPlainText(text)
+        editor.document().setModified(False)
+        editor.setReadOnly(False)
+        editor.tab_state.loading = False
         self.status.showMessage(f"Abriste: {path}", 3000)
 
+    def _on_file_load_failed(self, editor, path, err):
+        self._loaders.pop(editor, None)
+        idx = self.tabs.indexOf(editor)
+        if idx != -1:
+            self.tabs.removeTab(idx)
+        editor.deleteLater()
+        QMessageBox.warning(self, "Error", f"No se pudo abrir el archivo: {err}")
+
     def save_current(self):
         ed = self.tabs.currentWidget()
         if not ed:
             return
-        if not hasattr(ed, "file_path") or not ed.file_path:
+        if ed.tab_state.loading:
+            self.status.showMessage("El archivo aún se está cargando.", 3000)
+            return
+        if not ed.tab_state.file_path:
             return self.save_as_current(default_dir=self.project_root)
+        # Ctrl+S sobre un buffer sin cambios (y con el archivo aún en disco) no reescribe nada
+        if not ed.document().isModified() and os.path.exists(ed.tab_state.file_path):
+            self.status.showMessage("Sin cambios", 2000)
+            return
         try:
-            with open(ed.file_path, 'w', encoding='utf-8') as f:
+            with open(ed.tab_state.file_path, 'w', encoding='utf-8') as f:
                 f.write(ed.toPlainText())
             ed.document().setModified(False)
-            self.status.showMessage(f"Guardado: {ed.file_path}", 3000)
+            self.status.showMessage(f"Guardado: {ed.tab_state.file_path}", 3000)
         except Exception as ex:
             QMessageBox.warning(self, "Error", f"No se pudo guardar: {ex}")
 
@@ -792,6 +1226,9 @@ class MainWindow(QMainWindow):
         ed = self.tabs.currentWidget()
         if not ed:
             return
+        if ed.tab_state.loading:
+            self.status.showMessage("El archivo aún se está cargando.", 3000)
+            return
         start_dir = default_dir or STATE.get("last_dir", self.project_root)
         path, _ = QFileDialog.getSaveFileName(self, "Guardar como", start_dir, "Python Files (*.py);;All Files (*)")
         if not path:
@@ -799,7 +1236,7 @@ class MainWindow(QMainWindow):
         try:
             with open(path, 'w', encoding='utf-8') as f:
                 f.write(ed.toPlainText())
-            ed.file_path = path
+            ed.tab_state.file_path = path
             ed.document().setModified(False)
             self.tabs.setTabText(self.tabs.currentIndex(), os.path.basename(path))
             STATE["last_dir"] = os.path.dirname(path)
@@ -858,17 +1295,28 @@ class MainWindow(QMainWindow):
     # -----------------------
     # Encrypt / Decrypt
     # -----------------------
-    def encrypt_current(self):
+    def _replace_text(self, ed, text):
+        # Una sola edición deshacible en lugar de setPlainText, que además de
+        # reconstruir el documento borra el historial de deshacer
+        cursor = QTextCursor(ed.document())
+        cursor.beginEditBlock()
+        cursor.select(QTextCursor.Document)
+        cursor.insertText(text)
+        cursor.endEditBlock()
+
+    def _xor_current(self, message):
         ed = self.tabs.currentWidget()
-        if ed:
-            ed.setPlainText(xor_cipher(ed.toPlainText()))
-            self.status.showMessage("Contenido encriptado (XOR).", 3000)
+        # Documento vacío o aún cargándose: no hay nada que cifrar
+        if not ed or ed.tab_state.loading or ed.document().isEmpty():
+            return
+        self._replace_text(ed, xor_cipher(ed.toPlainText()))
+        self.status.showMessage(message, 3000)
+
+    def encrypt_current(self):
+        self._xor_current("Contenido encriptado (XOR).")
 
     def decrypt_current(self):
-        ed = self.tabs.currentWidget()
-        if ed:
-            ed.setPlainText(xor_cipher(ed.toPlainText()))
-            self.status.showMessage("Contenido desencriptado (XOR).", 3000)
+        self._xor_current("Contenido desencriptado (XOR).")
 
     # -----------------------
     # Debug syntax
@@ -877,26 +1325,63 @@ class MainWindow(QMainWindow):
         ed = self.tabs.currentWidget()
         if not ed:
             return
+        if ed.tab_state.loading:
+            self.status.showMessage("El archivo aún se está cargando.", 3000)
+            return
         ed.setExtraSelections([])
         self.output.clear()
+        # Si el documento no ha cambiado desde la última depuración se reutiliza el resultado
+        revision = ed.document().revision()
+        cached = ed.tab_state.syntax_check
+        if cached is not None and cached[0] == revision:
+            self._show_syntax_result(ed, cached[1], cached[2])
+            return
         code = ed.toPlainText()
-        try:
-            compile(code, '<string>', 'exec')
-            msg = ">>> No syntax errors detected.\n"
+        if len(code) >= ASYNC_COMPILE_THRESHOLD:
+            # Archivo grande: compile() se hace en otro proceso para no congelar la GUI
+            if self.check_proc.state() != QProcess.NotRunning:
+                # Se descarta la comprobación anterior sin mostrar su resultado
+                self._check_editor = None
+                self.check_proc.kill()
+                self.check_proc.waitForFinished()
+            self._check_editor = ed
+            self._check_revision = revision
+            self.status.showMessage("Comprobando sintaxis...")
+            self.check_proc.start(sys.executable, ["-c", CHECK_SYNTAX_SCRIPT])
+            self.check_proc.write(code.encode("utf-8"))
+            self.check_proc.closeWriteChannel()
+            return
+        ed.tab_state.syntax_check = (revision, *check_syntax(code))
+        self._show_syntax_result(ed, *ed.tab_state.syntax_check[1:])
+
+    def _check_finished(self, exit_code, exit_status):
+        ed, self._check_editor = self._check_editor, None
+        out = self.check_proc.readAllStandardOutput().data().decode("utf-8", "replace").strip()
+        if ed is None or self.tabs.indexOf(ed) == -1:
+            return
+        if exit_code != 0 or exit_status != QProcess.NormalExit:
+            err = self.check_proc.readAllStandardError().data().decode("utf-8", "replace")
+            self.status.showMessage("No se pudo comprobar la sintaxis.", 5000)
+            self.output.appendPlainText(err or ">>> No se pudo comprobar la sintaxis.")
+            return
+        if out:
+            result = json.loads(out)
+            ed.tab_state.syntax_check = (self._check_revision, result["lineno"] or 1, result["msg"])
+        else:
+            ed.tab_state.syntax_check = (self._check_revision, None, None)
+        self._show_syntax_result(ed, *ed.tab_state.syntax_check[1:])
+
+    def _show_syntax_result(self, ed, ln, msg):
+        if ln is None:
             self.status.showMessage("No syntax errors detected.", 5000)
-            self.output.appendPlainText(msg)
-        except SyntaxError as e:
-            ln = e.lineno or 1
-            from PySide6.QtWidgets import QTextEdit
-            sel = QTextEdit.ExtraSelection()
-            sel.format.setBackground(QColor("#FFCCCC"))
-            block = ed.document().findBlockByNumber(ln - 1)
-            sel.cursor = QTextCursor(block)
-            sel.cursor.clearSelection()
-            ed.setExtraSelections([sel])
-            err = f"SyntaxError en línea {ln}: {e.msg}\n"
-            self.status.showMessage(err, 7000)
-            self.output.appendPlainText(err)
+            self.output.appendPlainText(">>> No syntax errors detected.\n")
+            return
+        sel = self._error_selection
+        sel.cursor = QTextCursor(ed.document().findBlockByNumber(ln - 1))
+        ed.setExtraSelections([sel])
+        err = f"SyntaxError en línea {ln}: {msg}\n"
+        self.status.showMessage(err, 7000)
+        self.output.appendPlainText(err)
 
     # -----------------------
     # Run code
@@ -905,21 +1390,70 @@ class MainWindow(QMainWindow):
         ed = self.tabs.currentWidget()
         if not ed:
             return
-        code = ed.toPlainText()
-        tmp = tempfile.NamedTemporaryFile(suffix=".py", delete=False, mode="w", encoding="utf-8")
-        tmp.write(code)
-        tmp.close()
+        if ed.tab_state.loading:
+            self.status.showMessage("El archivo aún se está cargando.", 3000)
+            return
+        if self.proc is not None and self.proc.state() != QProcess.NotRunning:
+            self.status.showMessage("Ya hay una ejecución en curso.", 3000)
+            return
+        code = ed.toPlainText().encode("utf-8")
         self.output.clear()
+        self._flush_timer.stop()
+        self._out_buf.clear()
+        self._out_decoder.reset()
+        self._out_partial = ""
         self.status.showMessage("Ejecutando código...", 3000)
-        self.proc.start(sys.executable, [tmp.name])
+        proc = self._take_worker()
+        proc.readyReadStandardOutput.connect(self.handle_stdout)
+        proc.finished.connect(self.process_finished)
+        if self.proc is not None:
+            self.proc.deleteLater()
+        self.proc = proc
+        proc.write(f"{ed.tab_state.file_path}\n{len(code)}\n".encode("utf-8") + code)
+
+    def _prewarm_worker(self):
+        if self._warm_proc is None:
+            proc = QProcess(self)
+            proc.setProcessChannelMode(QProcess.MergedChannels)
+            proc.setProcessEnvironment(self._run_env)
+            proc.setProgram(sys.executable)
+            proc.setArguments(["-c", RUN_WORKER_SCRIPT])
+            proc.start()
+            self._warm_proc = proc
+
+    def _take_worker(self):
+        # Devuelve el intérprete precalentado (o uno nuevo si ha muerto) y deja de ser el de reserva
+        self._prewarm_worker()
+        proc, self._warm_proc = self._warm_proc, None
+        if proc.state() == QProcess.NotRunning:
+            proc.deleteLater()
+            self._prewarm_worker()
+            proc, self._warm_proc = self._warm_proc, None
+        return proc
 
     def handle_stdout(self):
-        text = self.proc.readAllStandardOutput().data().decode()
-        if text:
-            self.output.appendPlainText(text)
+        self._out_buf += self.proc.readAllStandardOutput().data()
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def _flush_output(self, final=False):
+        # Decodificador incremental: un carácter UTF-8 partido entre dos lecturas no se corrompe
+        text = self._out_partial + self._out_decoder.decode(bytes(self._out_buf), final)
+        self._out_buf.clear()
+        # Solo se añaden líneas completas; la última línea a medias espera a la
+        # siguiente lectura (appendPlainText siempre empieza un párrafo nuevo)
+        end = text.rfind("\n")
+        if end != -1:
+            self.output.appendPlainText(text[:end])
+        self._out_partial = text[end + 1:]
+        if final and self._out_partial:
+            self.output.appendPlainText(self._out_partial)
+            self._out_partial = ""
 
     def process_finished(self, exit_code, exit_status):
-        self.handle_stdout()
+        self._out_buf += self.proc.readAllStandardOutput().data()
+        self._flush_timer.stop()
+        self._flush_output(final=True)
         if exit_code == 0:
             final = ">>> Ejecución completada correctamente, sin errores."
             self.status.showMessage("Proceso finalizado (exit code 0)", 5000)
@@ -927,12 +1461,22 @@ class MainWindow(QMainWindow):
             final = f">>> Ejecución finalizada con errores (exit code {exit_code})."
             self.status.showMessage(final, 7000)
         self.output.appendPlainText(final)
+        # Preparar el intérprete de la próxima ejecución
+        QTimer.singleShot(0, self._prewarm_worker)
 
     # -----------------------
     # Close tab
     # -----------------------
     def close_tab(self, index):
+        # removeTab no destruye el widget: sin deleteLater cada pestaña cerrada
+        # seguiría en memoria con su documento y su resaltador
+        ed = self.tabs.widget(index)
         self.tabs.removeTab(index)
+        if ed is self._check_editor:
+            self._check_editor = None
+        # Si aún se está cargando, lo libera _on_file_loaded al terminar la lectura
+        if not ed.tab_state.loading:
+            ed.deleteLater()
         self.status.showMessage("Pestaña cerrada", 2000)
 
     # -----------------------
@@ -943,7 +1487,7 @@ class MainWindow(QMainWindow):
         unsaved = []
         for i in range(self.tabs.count()):
             ed = self.tabs.widget(i)
-            if hasattr(ed, "file_path") and ed.document().isModified():
+            if ed.document().isModified():
                 unsaved.append((i, ed))
         if unsaved:
             dlg = QMessageBox(self)
@@ -966,20 +1510,18 @@ class MainWindow(QMainWindow):
         open_files = []
         for i in range(self.tabs.count()):
             ed = self.tabs.widget(i)
-            if hasattr(ed, "file_path"):
-                try:
-                    common = os.path.commonpath([os.path.abspath(ed.file_path), os.path.abspath(self.project_root)])
-                except Exception:
-                    common = ""
-                if common == os.path.abspath(self.project_root):
-                    open_files.append(ed.file_path)
+            if ed.tab_state.file_path and self._in_project(ed.tab_state.file_path):
+                open_files.append(ed.tab_state.file_path)
         self.state["open_files"] = open_files
         self.state["current_theme"] = self.current_theme_name
-        try:
-            with open(STATE_PATH, "w", encoding="utf-8") as f:
-                json.dump(self.state, f, indent=2)
-        except Exception:
-            pass
+        if self.state != self._initial_state:
+            try:
+                write_json_atomic(STATE_PATH, self.state)
+            except Exception:
+                pass
+        if self._warm_proc is not None:
+            self._warm_proc.kill()
+            self._warm_proc.waitForFinished(1000)
         event.accept()
 
 # ---------------------------
@@ -987,6 +1529,8 @@ class MainWindow(QMainWindow):
 # ---------------------------
 def main():
     app = QApplication(sys.argv)
+    # Nombre de la carpeta de caché de QStandardPaths (ver pycache_dir)
+    app.setApplicationName("river-ide")
 
     # Project selector dialog at startup
     dlg = ProjectDialog()
@@ -8,56 +8,138 @@ PyIDE Educativo – selector de proyecto al inicio
 """
 
 import sys, os
-from PySide6.QtCore import QDir, QRegularExpression, Qt
+from functools import lru_cache
+from PySide6.QtCore import QDir, QObject, QRegularExpression, Qt, QTimer
 from PySide6.QtGui import (
     QAction, QColor, QFont,
-    QSyntaxHighlighter, QTextCharFormat, QTextCursor
+    QTextCharFormat, QTextCursor, QTextLayout
 )
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QHBoxLayout,
     QTreeView, QFileSystemModel, QTabWidget,
-    QPlainTextEdit, QStatusBar, QFileDialog,
+    QPlainTextEdit, QTextEdit, QStatusBar, QFileDialog,
     QMenuBar, QDockWidget, QTextBrowser, QMessageBox,
     QDialog, QVBoxLayout, QLabel, QPushButton, QHBoxLayout as QHLayout
 )
 
+from comun import write_text_file
+
+# -------------------------------------------------
+# Lectura de archivos
+# -------------------------------------------------
+def read_text_file(path):
+    """Contenido UTF-8 del archivo con saltos de línea "\n"."""
+    with open(path, "rb") as f:
+        data = f.read()
+    text = data.decode("utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
 # -------------------------------------------------
 # XOR Cipher
 # -------------------------------------------------
 ENCRYPTION_KEY = 67
+
+@lru_cache(maxsize=8)
+def _xor_table(key):
+    return bytes(i ^ key for i in range(256))
+
 def xor_cipher(text, key=ENCRYPTION_KEY):
+    if text.isascii() and 0 <= key < 128:
+        # Caso común: texto ASCII con clave < 128, el resultado sigue siendo ASCII
+        # y bytes.translate hace todo el bucle en C
+        return text.encode("ascii").translate(_xor_table(key)).decode("ascii")
     return ''.join(chr(ord(c) ^ key) for c in text)
 
 # -------------------------------------------------
 # Python Syntax Highlighter
 # -------------------------------------------------
-class PythonHighlighter(QSyntaxHighlighter):
-    def __init__(self, document):
-        super().__init__(document)
-        self.rules = []
-        kw_fmt = QTextCharFormat()
-        kw_fmt.setForeground(QColor("#569CD6"))
-        kw_fmt.setFontWeight(QFont.Bold)
-        keywords = [
-            "import","from","class","def","if","elif","else","for","while",
-            "return","in","and","or","not","with","as","try","except","finally",
-            "pass","break","continue","yield","assert","async","await",
-            "global","nonlocal","del","raise","is","lambda"
-        ]
-        for w in keywords:
-            pat = QRegularExpression(rf"\b{w}\b")
-            self.rules.append((pat, kw_fmt))
-        cm_fmt = QTextCharFormat()
-        cm_fmt.setForeground(QColor("#888888"))
-        cm_pat = QRegularExpression(r"#.*")
-        self.rules.append((cm_pat, cm_fmt))
+KEYWORDS = [
+    "import","from","class","def","if","elif","else","for","while",
+    "return","in","and","or","not","with","as","try","except","finally",
+    "pass","break","continue","yield","assert","async","await",
+    "global","nonlocal","del","raise","is","lambda"
+]
+# Una sola alternancia \b(?:kw1|kw2|...)\b compilada (y con JIT) una vez para
+# todos los editores; las más largas primero para que ningún prefijo tape a otra
+KEYWORD_PATTERN = QRegularExpression(
+    r"\b(?:" + "|".join(sorted(KEYWORDS, key=lambda w: (-len(w), w))) + r")\b"
+)
+KEYWORD_PATTERN.optimize()
+COMMENT_PATTERN = QRegularExpression(r"#.*")
+COMMENT_PATTERN.optimize()
+
+class PythonHighlighter(QObject):
+    """Resaltado de los bloques visibles, igual que ide.PythonHighlighter."""
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+        self.document = editor.document()
+        self.keyword_format = QTextCharFormat()
+        self.keyword_format.setForeground(QColor("#569CD6"))
+        self.keyword_format.setFontWeight(QFont.Bold)
+        self.comment_format = QTextCharFormat()
+        self.comment_format.setForeground(QColor("#888888"))
+        self._generation = 0
+        self._busy = False
+        editor.updateRequest.connect(self._on_update_request)
+        self.document.contentsChange.connect(self._on_contents_change)
+        self.highlightViewport()
+
+    def _on_update_request(self, rect, dy):
+        self.highlightViewport()
+
+    def _on_contents_change(self, position, removed, added):
+        if self._busy:
+            return
+        self.document.findBlock(position).setUserState(-1)
+        self.document.findBlock(position + added).setUserState(-1)
+        self.highlightViewport()
+
+    def highlightViewport(self):
+        if self._busy:
+            return
+        editor = self.editor
+        block = editor.firstVisibleBlock()
+        offset = editor.contentOffset()
+        bottom = editor.viewport().rect().bottom()
+        generation = self._generation
+        self._busy = True
+        try:
+            while block.isValid():
+                if editor.blockBoundingGeometry(block).translated(offset).top() > bottom:
+                    break
+                if block.userState() != generation:
+                    block.layout().setFormats(self.highlightBlock(block.text()))
+                    self.document.markContentsDirty(block.position(), block.length())
+                    block.setUserState(generation)
+                block = block.next()
+        finally:
+            self._busy = False
 
     def highlightBlock(self, text):
-        for pattern, fmt in self.rules:
-            it = pattern.globalMatch(text)
-            while it.hasNext():
-                m = it.next()
-                self.setFormat(m.capturedStart(), m.capturedLength(), fmt)
+        """Devuelve la lista de QTextLayout.FormatRange para una línea."""
+        if not text:
+            return []
+        # El comentario tapa todo lo que hay detrás, keywords incluidas
+        m = COMMENT_PATTERN.match(text)
+        comment_start = m.capturedStart() if m.hasMatch() else len(text)
+        fmt = self.keyword_format
+        ranges = []
+        it = KEYWORD_PATTERN.globalMatch(text)
+        while it.hasNext():
+            m = it.next()
+            if m.capturedStart() >= comment_start:
+                break
+            r = QTextLayout.FormatRange()
+            r.start, r.length, r.format = m.capturedStart(), m.capturedLength(), fmt
+            ranges.append(r)
+        if comment_start < len(text):
+            r = QTextLayout.FormatRange()
+            r.start, r.length, r.format = comment_start, len(text) - comment_start, self.comment_format
+            ranges.append(r)
+        return ranges
 
 # -------------------------------------------------
 # Project chooser dialog
@@ -140,14 +222,19 @@ class MainWindow(QMainWindow):
 
         # Store project root (folder) which limits the explorer and default save location
         self.project_root = project_root or os.getcwd()
+        self._project_abs = os.path.normcase(os.path.abspath(self.project_root))
+        self._project_prefix = os.path.join(self._project_abs, "")
 
         # File system explorer (limited to project_root)
         self.fs_model = QFileSystemModel()
         # setFilter to show files and dirs (default)
-        self.fs_model.setRootPath(self.project_root)
         self.tree = QTreeView()
         self.tree.setModel(self.fs_model)
-        self.tree.setRootIndex(self.fs_model.index(self.project_root))
+        # Solo la columna Name: la vista no pide tamaño, tipo ni fecha de cada entrada
+        for column in (1, 2, 3):
+            self.tree.setColumnHidden(column, True)
+        # La lectura del directorio se difiere hasta que la ventana ya se ha mostrado
+        QTimer.singleShot(0, self._populate_tree)
         self.tree.doubleClicked.connect(self.open_from_tree)
 
         # Tabs for editors
@@ -188,6 +275,7 @@ class MainWindow(QMainWindow):
         self.open_multi_act = self._make_action("Abrir múltiples...", self.open_multiple, None, "Abrir varios archivos")
         self.new_file_act = self._make_action("Nuevo archivo...", self.new_file, None, "Crear un nuevo archivo dentro del proyecto")
         self.save_act = self._make_action("Guardar", self.save_current, "Ctrl+S", "Guardar el archivo actual (en la carpeta del proyecto)")
+        self.save_sync_act = self._make_action("Guardar y sincronizar", self.save_sync_current, "Ctrl+Alt+S", "Guardar y forzar la escritura en disco")
         self.save_as_act = self._make_action("Guardar como...", self.save_as_current, None, "Guardar con nuevo nombre")
         exit_act = self._make_action("Salir", self.close, None, "Salir del IDE")
         file_menu.addAction(self.open_act)
@@ -195,6 +283,7 @@ class MainWindow(QMainWindow):
         file_menu.addAction(self.new_file_act)
         file_menu.addSeparator()
         file_menu.addAction(self.save_act)
+        file_menu.addAction(self.save_sync_act)
         file_menu.addAction(self.save_as_act)
         file_menu.addSeparator()
         file_menu.addAction(exit_act)
@@ -273,25 +362,33 @@ class MainWindow(QMainWindow):
         editor = QPlainTextEdit()
         editor.setPlainText(code)
         editor.file_path = None
-        PythonHighlighter(editor.document())
+        PythonHighlighter(editor)
         self.tabs.addTab(editor, "Ejemplo.py")
         self.status.showMessage("Ejemplo cargado", 3000)
 
+    def _populate_tree(self):
+        self.fs_model.setRootPath(self.project_root)
+        self.tree.setRootIndex(self.fs_model.index(self.project_root))
+
+    def _in_project(self, path):
+        # Comparación de prefijo contra la raíz ya normalizada en __init__
+        p = os.path.normcase(os.path.abspath(path))
+        return p == self._project_abs or p.startswith(self._project_prefix)
+
     def _load_path(self, path):
         # Only allow files inside project_root
-        if not os.path.commonpath([os.path.abspath(path), os.path.abspath(self.project_root)]) == os.path.abspath(self.project_root):
+        if not self._in_project(path):
             QMessageBox.warning(self, "Fuera del proyecto", "Solo puedes abrir archivos dentro de la carpeta del proyecto.")
             return
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                text = f.read()
+            text = read_text_file(path)
         except Exception as ex:
             QMessageBox.warning(self, "Error", f"No se pudo abrir el archivo: {ex}")
             return
         editor = QPlainTextEdit()
         editor.setPlainText(text)
         editor.file_path = path
-        PythonHighlighter(editor.document())
+        PythonHighlighter(editor)
         title = os.path.basename(path)
         self.tabs.addTab(editor, title)
         self.status.showMessage(f"Abriste: {path}", 3000)
@@ -333,20 +430,27 @@ class MainWindow(QMainWindow):
             return
         self._load_path(candidate)
 
-    def save_current(self):
+    def save_current(self, sync=False):
         ed = self.tabs.currentWidget()
         if not ed:
             return
         # If file has associated path, save there; else default to project_root Save As
         if not hasattr(ed, 'file_path') or not ed.file_path:
             return self.save_as_current(default_dir=self.project_root)
+        if not ed.document().isModified() and os.path.exists(ed.file_path):
+            self.status.showMessage("Sin cambios", 2000)
+            return
         try:
-            with open(ed.file_path, 'w', encoding='utf-8') as f:
-                f.write(ed.toPlainText())
+            write_text_file(ed.file_path, ed.toPlainText(), sync=sync)
+            ed.document().setModified(False)
             self.status.showMessage(f"Guardado: {ed.file_path}", 3000)
         except Exception as ex:
             QMessageBox.warning(self, "Error", f"No se pudo guardar: {ex}")
 
+    def save_sync_current(self):
+        # Como Guardar, pero esperando a que el archivo quede escrito en disco
+        self.save_current(sync=True)
+
     def save_as_current(self, default_dir=None):
         ed = self.tabs.currentWidget()
         if not ed:
@@ -358,8 +462,8 @@ class MainWindow(QMainWindow):
         if not path:
             return
         try:
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(ed.toPlainText())
+            write_text_file(path, ed.toPlainText())
+            ed.document().setModified(False)
             ed.file_path = path
             self.tabs.setTabText(self.tabs.currentIndex(), os.path.basename(path))
             self.status.showMessage(f"Guardado como: {path}", 3000)
@@ -369,18 +473,27 @@ class MainWindow(QMainWindow):
     # ----------------------------
     # Utilities: encrypt/decrypt/debug/close
     # ----------------------------
+    def _replace_text(self, ed, text):
+        # Una sola edición deshacible en lugar de setPlainText, que además de
+        # borrar el historial de deshacer marcaría el documento como no modificado
+        cursor = QTextCursor(ed.document())
+        cursor.beginEditBlock()
+        cursor.select(QTextCursor.Document)
+        cursor.insertText(text)
+        cursor.endEditBlock()
+
     def encrypt_current(self):
         ed = self.tabs.currentWidget()
         if not ed:
             return
-        ed.setPlainText(xor_cipher(ed.toPlainText()))
+        self._replace_text(ed, xor_cipher(ed.toPlainText()))
         self.status.showMessage("Contenido encriptado", 3000)
 
     def decrypt_current(self):
         ed = self.tabs.currentWidget()
         if not ed:
             return
-        ed.setPlainText(xor_cipher(ed.toPlainText()))
+        self._replace_text(ed, xor_cipher(ed.toPlainText()))
         self.status.showMessage("Contenido desencriptado", 3000)
 
     def debug_current(self):
@@ -388,22 +501,30 @@ class MainWindow(QMainWindow):
         if not ed:
             return
         ed.setExtraSelections([])
-        code = ed.toPlainText()
-        try:
-            compile(code, '<string>', 'exec')
+        # Resultado cacheado por revisión del documento
+        revision = ed.document().revision()
+        cached = getattr(ed, 'syntax_check', None)
+        if cached is None or cached[0] != revision:
+            try:
+                compile(ed.toPlainText(), '<string>', 'exec')
+                cached = (revision, None, None)
+            except SyntaxError as e:
+                cached = (revision, e.lineno or 1, e.msg)
+            ed.syntax_check = cached
+        _, ln, error = cached
+        if ln is None:
             self.status.showMessage("✅ Sin errores de sintaxis", 3000)
-        except SyntaxError as e:
-            ln = e.lineno or 1
+        else:
             sel = QTextEdit.ExtraSelection()
             sel.format.setBackground(QColor("#FFCCCC"))
             block = ed.document().findBlockByNumber(ln - 1)
             sel.cursor = QTextCursor(block)
             sel.cursor.clearSelection()
             ed.setExtraSelections([sel])
-            msg = f"❌ Error en línea {ln}: {e.msg}"
-            if "expected ':'" in e.msg:
+            msg = f"❌ Error en línea {ln}: {error}"
+            if "expected ':'" in error:
                 msg += " → ¿Olvidaste el ':'?"
-            elif "unexpected EOF" in e.msg:
+            elif "unexpected EOF" in error:
                 msg += " → ¿Falta cerrar paréntesis o comillas?"
             QMessageBox.warning(self, "Depuración", msg)
             self.status.showMessage(msg, 5000)
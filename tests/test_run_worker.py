@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del intérprete precalentado que usa Run (RUN_WORKER_SCRIPT)."""
+
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from comun import RUN_WORKER_SCRIPT  # noqa: E402
+
+
+def run_worker(path, source):
+    # Mismo protocolo que MainWindow.run_current: ruta, tamaño en bytes y código
+    data = source.encode("utf-8")
+    payload = f"{path}\n{len(data)}\n".encode("utf-8") + data
+    return subprocess.run([sys.executable, "-c", RUN_WORKER_SCRIPT],
+                          input=payload, capture_output=True, timeout=30)
+
+
+def test_pickles_class_defined_in_script(tmp_path):
+    path = str(tmp_path / "script.py")
+    source = (
+        "import pickle, sys\n"
+        "class A:\n"
+        "    pass\n"
+        "obj = pickle.loads(pickle.dumps(A()))\n"
+        "print(type(obj).__name__, __name__, sys.modules['__main__'].__file__ == __file__)\n"
+    )
+    result = run_worker(path, source)
+    assert result.returncode == 0, result.stderr.decode("utf-8", "replace")
+    assert result.stdout.decode("utf-8").split() == ["A", "__main__", "True"]
+
+
+def test_traceback_shows_source_line(tmp_path):
+    path = str(tmp_path / "script.py")
+    result = run_worker(path, "def f():\n    1/0\nf()\n")
+    assert result.returncode == 1
+    err = result.stderr.decode("utf-8")
+    assert f'File "{path}", line 2' in err
+    assert "1/0" in err